@@ -0,0 +1,182 @@
+"""Preload-and-fork entry point for running several uvicorn workers.
+
+The master process imports ``main`` once, which builds the resume pipeline
+(GLiNER, spaCy-Layout and the Haar cascade), freezes the GC and then forks
+``WEB_CONCURRENCY`` workers. The workers inherit the loaded models and share
+their memory copy-on-write instead of each loading its own copy, which is
+what plain ``uvicorn --workers N`` would do (it spawns fresh interpreters).
+
+Usage (from the ``app`` directory):
+    WEB_CONCURRENCY=2 TORCH_NUM_THREADS=1 python server.py
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict
+
+from fastapi import FastAPI
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "80"))
+WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+# Intra-op threads per worker. Keep workers * threads <= available vCPUs,
+# otherwise the workers fight each other for cores.
+TORCH_NUM_THREADS = max(1, int(os.getenv("TORCH_NUM_THREADS", "1")))
+# Give up (and exit non-zero so ECS replaces the task) once this many workers
+# have crashed within RESTART_WINDOW seconds.
+MAX_RESTARTS = int(os.getenv("MAX_WORKER_RESTARTS", "5"))
+RESTART_WINDOW = float(os.getenv("WORKER_RESTART_WINDOW", "60"))
+
+# The master must stay single-threaded: an OpenMP pool started while the
+# models load is not fork-safe and can hang the workers. This has to be set
+# before torch is imported (via gliner). The operator's values are kept so
+# run_worker() can put them back after the fork.
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS")
+_worker_thread_env = {name: os.getenv(name, str(TORCH_NUM_THREADS)) for name in THREAD_ENV_VARS}
+for _name in THREAD_ENV_VARS:
+    os.environ[_name] = "1"
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+logger = logging.getLogger("server")
+
+
+def preload() -> FastAPI:
+    import torch
+
+    torch.set_num_threads(1)
+    # Disable GC while the models load so no collection runs half-way through
+    # and leaves freed holes on pages that the workers would later dirty.
+    gc.disable()
+    from main import app  # builds resume_pipeline and loads all models
+    gc.collect()
+    # Move every surviving object to the permanent generation: the workers'
+    # collector will never traverse them, so it does not write to their
+    # headers and trigger copy-on-write of the shared pages.
+    gc.freeze()
+    return app
+
+
+def bind_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(2048)
+    return sock
+
+
+def run_worker(app: FastAPI, sock: socket.socket) -> None:
+    import cv2
+    import torch
+    import uvicorn
+
+    gc.enable()
+    # Undo the master's single-thread pinning for anything that reads the
+    # environment from here on, then size the pools that are already loaded.
+    os.environ.update(_worker_thread_env)
+    torch.set_num_threads(TORCH_NUM_THREADS)  # also sets MKL's thread count
+    cv2.setNumThreads(TORCH_NUM_THREADS)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Already fixed if the master ran any parallel op before forking.
+        pass
+
+    # The socket is bound by the master, so no host/port here.
+    uvicorn.Server(uvicorn.Config(app)).run(sockets=[sock])
+
+
+def spawn(app: FastAPI, sock: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        # Drop the master's shutdown handler straight away, otherwise a signal
+        # here would make this child SIGTERM its siblings.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(app, sock)
+        except BaseException:
+            logger.exception("Worker crashed")
+            code = 1
+        finally:
+            os._exit(code)
+    logger.info(f"Started worker pid={pid}")
+    return pid
+
+
+def main() -> int:
+    app = preload()
+    sock = bind_socket()
+    logger.info(f"Models preloaded; forking {WORKERS} worker(s) on {HOST}:{PORT} "
+                f"with {TORCH_NUM_THREADS} torch thread(s) each")
+
+    workers: Dict[int, int] = {}  # pid -> worker slot
+    crashes: Deque[float] = deque()
+    shutting_down = False
+    exit_code = 0
+
+    def stop_workers() -> None:
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def shutdown(signum, _frame):
+        nonlocal shutting_down
+        shutting_down = True
+        stop_workers()
+
+    # Installed before forking so a SIGTERM during startup still reaches every
+    # worker instead of killing the master and orphaning them.
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for slot in range(WORKERS):
+        if shutting_down:
+            break
+        workers[spawn(app, sock)] = slot
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        slot = workers.pop(pid, None)
+        if slot is None:
+            continue
+        if shutting_down:
+            logger.info(f"Worker pid={pid} exited")
+            continue
+
+        now = time.monotonic()
+        crashes.append(now)
+        while crashes and now - crashes[0] > RESTART_WINDOW:
+            crashes.popleft()
+        if len(crashes) > MAX_RESTARTS:
+            logger.error(f"{len(crashes)} worker crashes within {RESTART_WINDOW:.0f}s; shutting down")
+            shutting_down = True
+            exit_code = 1
+            stop_workers()
+            continue
+
+        # Replace crashed workers from the still-warm master so the new
+        # process shares the preloaded models too.
+        logger.warning(f"Worker pid={pid} exited unexpectedly (status={status}); restarting")
+        time.sleep(1)
+        if shutting_down:
+            # SIGTERM arrived during the back-off; nobody would stop a new worker.
+            continue
+        workers[spawn(app, sock)] = slot
+
+    sock.close()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
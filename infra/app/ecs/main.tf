@@ -120,7 +120,11 @@ resource "aws_ecs_task_definition" "api" {
     {
       name    = "${var.app_name}-api-container"
       image   = "${var.image}"
-      command = ["uvicorn", "main:app", "--host", "0.0.0.0", "--port", "80"]
+      command = ["python", "server.py"]
+      environment = [
+        { name = "WEB_CONCURRENCY", value = "1" },
+        { name = "TORCH_NUM_THREADS", value = "1" }
+      ]
       portMappings = [
         {
           hostPort      = 80